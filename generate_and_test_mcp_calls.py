@@ -1,56 +1,56 @@
 import os
-import json
-import pandas as pd
-import requests
-from pathlib import Path
-from typing import Union
+import queue
+import asyncio
+import threading
+import orjson
+from openai import AsyncOpenAI
+from functools import lru_cache
+from mcp_core import (
+    MCP_ENDPOINT,
+    CACHE_DIR,
+    get_param_cache_path,
+    load_cached_params,
+    save_cached_params,
+    flush_param_cache,
+    call_mcp,
+    call_mcp_async,
+    create_mcp_client,
+    classify_response_status,
+    classify_response_status_raw
+)
 
 # === CONFIGURATION ===
 EXCEL_PATH = "configinput.xlsx"
-MCP_ENDPOINT = "https://tooluniversemcpserver.onrender.com/mcp/"
 OPENAI_KEY = ''
-CACHE_DIR = Path("param_cache")
-CACHE_DIR.mkdir(exist_ok=True)
+SAMPLE_ARGS_MODEL = "gpt-4o-mini"
 
 TOOLS_JSON_PATH = "tools_restored.json" 
 
-
-# === CACHE FUNCTIONS FOR PARAMETERS ONLY ===
-def get_param_cache_path(tool_name: str) -> Path:
-    safe_name = tool_name.replace("/", "_").replace(" ", "_")
-    return CACHE_DIR / f"{safe_name}_params.json"
-
-def load_cached_params(tool_name: str):
-    path = get_param_cache_path(tool_name)
-    if path.exists():
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return None
-
-def save_cached_params(tool_name: str, param_data: dict):
-    path = get_param_cache_path(tool_name)
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(param_data, f, indent=2)
+# Concurrency limits for the async MCP sweep
+MCP_MAX_CONNECTIONS = 32
+MCP_MAX_IN_FLIGHT = 16
+GPT_MAX_IN_FLIGHT = 8  # concurrent sample-input generations; keeps clear of rate limits
 
 # === HELPER FUNCTIONS ===
 
 
+_EXCLUDED_CATEGORIES = frozenset({"langchaintool", "pubchem"})  # add more here if needed
+
 def _is_excluded_category(cat):
     """
     Return True if the tool category is excluded (LangchainTool or PubChem).
     Works for string or list categories.
     """
-    excluded = {"langchaintool", "pubchem"}  # add more here if needed
-
-    if not cat:
+    if cat is None or cat == "":
         return False
 
-    if isinstance(cat, str):
-        return cat.strip().lower() in excluded
+    # Exact type check: categories are plain JSON strings, and this runs per tool
+    if cat.__class__ is str:
+        return cat.strip().lower() in _EXCLUDED_CATEGORIES
 
     if isinstance(cat, (list, tuple)):
         return any(
-            isinstance(x, str) and x.strip().lower() in excluded
+            isinstance(x, str) and x.strip().lower() in _EXCLUDED_CATEGORIES
             for x in cat
         )
 
@@ -58,151 +58,223 @@ def _is_excluded_category(cat):
 
 
 def load_tools_from_json(path: str = TOOLS_JSON_PATH):
-    with open(path, "r", encoding="utf-8") as f:
-        tools = json.load(f)
+    with open(path, "rb") as f:
+        tools = orjson.loads(f.read())
 
-    api_tools = []
-    for t in tools:
-        tool_type = (t.get("toolType") or "").strip().lower()
-        if tool_type != "api":
-            continue
-        if _is_excluded_category(t.get("category")):
-            continue 
+    api_tools = [
+        t for t in tools
+        if (t.get("toolType") or "").strip().lower() == "api"
+        and not _is_excluded_category(t.get("category"))
+    ]
 
+    for t in api_tools:
         t["_properties"] = (t.get("inputSchema") or {}).get("properties", {})  # dict or {}
         t["_example"]    = t.get("exampleInput") or {}                          # dict or {}
-        api_tools.append(t)
 
     return api_tools
 
 
 
-def call_mcp(tool_name, arguments):
-    payload = {
-        "jsonrpc": "2.0",
-        "id": "1",
-        "method": "tools/call",
-        "params": {
-            "name": tool_name,
-            "arguments": arguments
-        }
-    }
+# === GPT SAMPLE INPUT GENERATION ===
+@lru_cache(maxsize=1024)
+def _build_prompt(tool_name: str, props_json: str) -> str:
+    return (
+        "You are a helpful assistant generating example input for a tool.\n"
+        f"Tool name: {tool_name}\n"
+        "Here are its parameter fields and their descriptions as JSON:\n"
+        f"{props_json}\n"
+        "Please respond ONLY with a valid JSON dictionary containing realistic values for each parameter.\n"
+        "Do NOT explain anything. Just return the JSON."
+    )
+
+async def generate_sample_arguments_async(aclient: AsyncOpenAI, tool_name, param_properties):
+    props_json = orjson.dumps(
+        param_properties, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS
+    ).decode()
+    system_prompt = _build_prompt(tool_name, props_json)
 
     try:
-        response = requests.post(
-            MCP_ENDPOINT,
-            headers={
-                "Content-Type": "application/json",
-                "Accept": "application/json, text/event-stream"
-            },
-            data=json.dumps(payload),
-            timeout=30,
-            stream=True
+        response = await aclient.chat.completions.create(
+            model=SAMPLE_ARGS_MODEL,
+            messages=[{"role": "system", "content": system_prompt}],
+            temperature=0.7,
+            max_tokens=500
         )
-
-        # Check if it's SSE (by looking for `data:` lines)
-        if "text/event-stream" in response.headers.get("Content-Type", ""):
-            full_data = ""
-            for line in response.iter_lines(decode_unicode=True):
-                if line.strip().startswith("data:"):
-                    json_part = line.strip().replace("data:", "").strip()
-                    full_data += json_part
-
-            try:
-                return json.loads(full_data)
-            except Exception as e:
-                return {"error": f"Failed to parse streamed JSON: {e}", "raw": full_data}
-
-        else:
-            # Standard JSON response
-            try:
-                return response.json()
-            except Exception as e:
-                return {"error": f"Failed to parse JSON: {e}", "raw": response.text}
-
+        output = response.choices[0].message.content
+        parsed_output = orjson.loads(output)
+        if not isinstance(parsed_output, dict):
+            raise ValueError(f"expected a JSON object, got {type(parsed_output).__name__}")
+        save_cached_params(tool_name, parsed_output)
+        return parsed_output
     except Exception as e:
-        return {"error": str(e)}
+        print(f"❌ GPT error for {tool_name}: {e}")
+        return None
 
+def resolve_sample_inputs(tools):
+    """
+    Set t["_input"] from the tool's exampleInput, else its cached parameters.
+    Returns the tools that still need a GPT-generated sample.
+    """
+    missing = []
+    for t in tools:
+        example = t.get("_example")
+        if isinstance(example, dict) and len(example) > 0:
+            t["_input"] = example
+            continue
+        if not isinstance(t.get("_properties"), dict):
+            continue
 
+        t["_input"] = load_cached_params(t.get("name"))
+        if not t["_input"]:
+            missing.append(t)
 
+    return missing
 
-def classify_response_status(raw_response: Union[str, dict]) -> str:
+def _create_gpt_client(missing):
     try:
-        if isinstance(raw_response, str):
-            parsed = json.loads(raw_response)
-        else:
-            parsed = raw_response
-
-        result = parsed.get("result", {})
-        is_error = result.get("isError", None)
-        content = result.get("content", "")
-
-        # ✅ Override: treat as success if specific string appears in content
-        if is_error is True:
-            if isinstance(content, list) and any(
-                isinstance(item, dict) and "text" in item and
-                "Tools should wrap non-dict values based on their output_schema" in item["text"]
-                for item in content
-            ):
-                return "success"
-            else:
-                return "error"
-
-        elif is_error is False:
-            return "success"
-        else:
-            return "unknown"
+        return AsyncOpenAI(api_key=OPENAI_KEY or None)  # None falls back to OPENAI_API_KEY
+    except Exception as e:
+        print(f"❌ GPT client unavailable, skipping {len(missing)} tools: {e}")
+        return None
 
-    except Exception:
-        return "unknown"
 
+def load_tools_and_generate_calls():
+    return run_all_tool_tests_streaming()
 
+async def _test_tool(session, sem, aclient, gpt_sem, tool):
+    name = tool.get("name")
+    description = tool.get("description", "")
+    tool_type = tool.get("toolType", "")
+    properties = tool.get("_properties", {})          # from loader normalization
+
+    # Safety: ensure we have a dict of properties
+    if not isinstance(properties, dict):
+        return {"name": name, "error": "Invalid parameter properties in JSON"}
+
+    # exampleInput or cached params from resolve_sample_inputs, else ask GPT;
+    # generating per tool lets results stream while other samples are pending
+    gpt_output = tool.get("_input")
+    if not gpt_output and aclient is not None:
+        async with gpt_sem:
+            gpt_output = await generate_sample_arguments_async(aclient, name, properties)
+    if not gpt_output:
+        return {"name": name, "error": "Failed to generate sample input"}
+
+    async with sem:
+        mcp_response = await call_mcp_async(session, name, gpt_output)
+    output = mcp_response
+    status = classify_response_status(output)
+
+    return {
+        "name": name,
+        "description": description,
+        "type": tool_type,
+        "parameters": properties,
+        "input": gpt_output,
+        "output": output,
+        "status": status
+    }
 
+def _matches_filters(tool, name_filter, type_filter):
+    # Filters are already lowercased; a tool matches if either field contains its filter
+    if name_filter and name_filter in (tool.get("name") or "").lower():
+        return True
+    if type_filter and type_filter in (tool.get("toolType") or "").lower():
+        return True
+    return False
 
+async def run_all_tool_tests_async(name_filter: str | None = None, type_filter: str | None = None):
+    """
+    Test every tool concurrently (at most MCP_MAX_IN_FLIGHT requests at once)
+    and yield each result as soon as it completes. When a name or type filter
+    is given, only tools whose name or type contains it are tested.
+    """
+    all_tools = load_tools_from_json()
+    if name_filter or type_filter:
+        name_filter = name_filter.lower() if name_filter else None
+        type_filter = type_filter.lower() if type_filter else None
+        all_tools = [t for t in all_tools if _matches_filters(t, name_filter, type_filter)]
+    missing = resolve_sample_inputs(all_tools)
+    aclient = _create_gpt_client(missing) if missing else None
 
-def load_tools_and_generate_calls():
-    return run_all_tool_tests_streaming()
+    sem = asyncio.Semaphore(MCP_MAX_IN_FLIGHT)
+    gpt_sem = asyncio.Semaphore(GPT_MAX_IN_FLIGHT)
 
-def run_all_tool_tests_streaming():
-    all_tools = load_tools_from_json()
+    try:
+        async with create_mcp_client(MCP_MAX_CONNECTIONS) as session:
+            tasks = [_test_tool(session, sem, aclient, gpt_sem, tool) for tool in all_tools]
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                # Lowercased once here so dashboard filtering doesn't redo it on every rerun
+                result["_name_lc"] = (result.get("name") or "").lower()
+                result["_type_lc"] = (result.get("type") or "").lower()
+                yield result
+    finally:
+        if aclient is not None:
+            await aclient.close()
+        # One manifest write per run; atexit covers anything saved later
+        flush_param_cache()
+
+def run_all_tool_tests_streaming(name_filter: str | None = None, type_filter: str | None = None,
+                                 idle_interval: float | None = None):
+    """
+    Synchronous generator over run_all_tool_tests_async, for callers such as
+    the Streamlit dashboard. The event loop runs in a worker thread and hands
+    results back through a queue as they complete. Closing the generator
+    (e.g. on a Streamlit rerun) cancels the sweep. With idle_interval set,
+    None is yielded whenever no result arrives within that many seconds, so
+    callers can flush buffered output while waiting.
+    """
+    results = queue.Queue()
+    done = object()
+    stop = threading.Event()
+    running = {}
+
+    async def _drain():
+        # Publish the task before checking stop, so close() either sees it
+        # and cancels it, or has already set stop and we bail out here
+        running["loop"] = asyncio.get_running_loop()
+        running["task"] = asyncio.current_task()
+        if stop.is_set():
+            return
+        async for result in run_all_tool_tests_async(name_filter, type_filter):
+            if stop.is_set():
+                return
+            results.put(result)
+
+    def _worker():
+        try:
+            asyncio.run(_drain())
+        except asyncio.CancelledError:
+            pass
+        except BaseException as e:
+            results.put(e)
+        finally:
+            results.put(done)
+
+    threading.Thread(target=_worker, daemon=True).start()
 
-    for tool in all_tools:
-        name = tool.get("name")
-        description = tool.get("description", "")
-        tool_type = tool.get("toolType", "")
-        properties = tool.get("_properties", {})          # from loader normalization
-        example    = tool.get("_example", {})             # from loader normalization
-    
-        # Safety: ensure we have a dict of properties
-        if not isinstance(properties, dict):
-            yield {"name": name, "error": "Invalid parameter properties in JSON"}
-            continue
-    
-        # Prefer the JSON's exampleInput; fall back to the GPT-generated sample if missing.
-        if isinstance(example, dict) and len(example) > 0:
-            gpt_output = example
-        else:
-            gpt_output = generate_sample_arguments(name, properties)
-            if not gpt_output:
-                yield {"name": name, "error": "Failed to generate sample input"}
+    try:
+        while True:
+            try:
+                result = results.get(timeout=idle_interval)
+            except queue.Empty:
+                yield None
                 continue
-    
-        mcp_response = call_mcp(name, gpt_output)
-        output = mcp_response
-        status = classify_response_status(output)
-    
-        yield {
-            "name": name,
-            "description": description,
-            "type": tool_type,
-            "parameters": properties,
-            "input": gpt_output,
-            "output": output,
-            "status": status
-        }
-    
-        
-    
+            if result is done:
+                return
+            if isinstance(result, BaseException):
+                raise result
+            yield result
+    finally:
+        stop.set()
+        if "task" in running:
+            try:
+                running["loop"].call_soon_threadsafe(running["task"].cancel)
+            except RuntimeError:
+                pass  # loop already closed: the sweep has finished
+
+
 # Optional CLI entry
 def main():
     for result in run_all_tool_tests_streaming():
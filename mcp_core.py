@@ -0,0 +1,264 @@
+# Shared MCP transport, response classification and parameter cache helpers
+import os
+import atexit
+import threading
+import aiohttp
+from aiohttp_retry import RetryClient, ExponentialRetry
+import orjson
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from pathlib import Path
+from typing import Union
+
+# === CONFIGURATION ===
+MCP_ENDPOINT = "https://tooluniversemcpserver.onrender.com/mcp/"
+CACHE_DIR = Path("param_cache")
+CACHE_DIR.mkdir(exist_ok=True)
+
+MCP_HEADERS = {
+    "Content-Type": "application/json",
+    "Accept": "application/json, text/event-stream"
+}
+
+# Async client limits: fail fast on connect, 30s for the whole request
+MCP_TIMEOUT = aiohttp.ClientTimeout(total=30, connect=5)
+MCP_RETRY_OPTIONS = ExponentialRetry(
+    attempts=3,
+    statuses={502, 503, 504},
+    exceptions={aiohttp.ClientConnectionError},  # includes connect timeouts
+    methods={"POST"},  # tools/call is POST; aiohttp_retry skips it by default
+    retry_all_server_errors=False
+)
+
+# Fixed JSON-RPC envelope for tools/call; only the name and arguments vary
+_PAYLOAD_PREFIX = b'{"jsonrpc":"2.0","id":"1","method":"tools/call","params":{"name":'
+_PAYLOAD_ARGS = b',"arguments":'
+_PAYLOAD_SUFFIX = b'}}'
+
+# Error text that classify_response_status treats as a success
+_OVERRIDE_TEXT = "Tools should wrap non-dict values based on their output_schema"
+
+# Shared session for the sync call_mcp path so connections are kept alive
+_SESSION = requests.Session()
+_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=32,
+    max_retries=Retry(
+        total=2,
+        backoff_factor=0.2,
+        status_forcelist=[502, 503, 504],
+        allowed_methods=frozenset({"POST"}),  # tools/call is POST; urllib3 skips it by default
+        raise_on_status=False
+    )
+))
+
+
+# === CACHE FUNCTIONS FOR PARAMETERS ONLY ===
+# All cached params live in memory; new entries are written back together to
+# one manifest file instead of one file per tool. The manifest only ever holds
+# entries saved through save_cached_params, never copies of per-tool files.
+PARAM_CACHE_MANIFEST = CACHE_DIR / "_all.json"
+
+_PARAM_MANIFEST = {}  # what flush_param_cache writes
+_PARAM_MEM = {}       # manifest entries overlaid with the per-tool files
+_PARAM_MEM_LOADED = False
+_PARAM_DIRTY = False
+_PARAM_LOCK = threading.Lock()
+
+def get_param_cache_path(tool_name: str) -> Path:
+    safe_name = tool_name.replace("/", "_").replace(" ", "_")
+    return CACHE_DIR / f"{safe_name}_params.json"
+
+def _param_cache_key(tool_name: str) -> str:
+    return get_param_cache_path(tool_name).name
+
+def _read_cache_file(path: Path):
+    # A corrupt or unreadable file only loses its own entries
+    try:
+        return orjson.loads(path.read_bytes())
+    except (OSError, orjson.JSONDecodeError) as e:
+        print(f"⚠️ Skipping unreadable param cache file {path}: {e}")
+        return None
+
+def _param_mem() -> dict:
+    # Read every cache file once per process (Streamlit reruns included).
+    # Per-tool files are applied last so hand edits to them always win.
+    global _PARAM_MEM_LOADED
+    if not _PARAM_MEM_LOADED:
+        with _PARAM_LOCK:
+            if not _PARAM_MEM_LOADED:
+                # Build into locals and publish at the end, so a failed load
+                # never leaves the module-level dicts half-populated
+                manifest = {}
+                if PARAM_CACHE_MANIFEST.exists():
+                    data = _read_cache_file(PARAM_CACHE_MANIFEST)
+                    if isinstance(data, dict):
+                        manifest = data
+                mem = dict(manifest)
+                for path in CACHE_DIR.glob("*_params.json"):
+                    data = _read_cache_file(path)
+                    if data is not None:
+                        mem[path.name] = data
+
+                _PARAM_MANIFEST.update(manifest)
+                _PARAM_MEM.update(mem)
+                _PARAM_MEM_LOADED = True
+    return _PARAM_MEM
+
+def load_cached_params(tool_name: str):
+    return _param_mem().get(_param_cache_key(tool_name))
+
+def save_cached_params(tool_name: str, param_data: dict):
+    global _PARAM_DIRTY
+    mem = _param_mem()
+    with _PARAM_LOCK:
+        key = _param_cache_key(tool_name)
+        mem[key] = param_data
+        _PARAM_MANIFEST[key] = param_data
+        _PARAM_DIRTY = True
+
+def flush_param_cache():
+    """Write the in-memory param cache to the manifest if anything changed."""
+    global _PARAM_DIRTY
+    with _PARAM_LOCK:
+        if not _PARAM_DIRTY:
+            return
+        tmp_path = PARAM_CACHE_MANIFEST.with_suffix(".tmp")
+        tmp_path.write_bytes(orjson.dumps(_PARAM_MANIFEST, option=orjson.OPT_INDENT_2))
+        os.replace(tmp_path, PARAM_CACHE_MANIFEST)
+        _PARAM_DIRTY = False
+
+atexit.register(flush_param_cache)
+
+
+# === MCP CALLS ===
+def build_mcp_payload(tool_name, arguments) -> bytes:
+    """Serialize a tools/call request body from the pre-encoded envelope."""
+    return b"".join((
+        _PAYLOAD_PREFIX,
+        orjson.dumps(tool_name),
+        _PAYLOAD_ARGS,
+        orjson.dumps(arguments, option=orjson.OPT_NON_STR_KEYS),  # {1: "a"} -> {"1": "a"}, as json.dumps did
+        _PAYLOAD_SUFFIX
+    ))
+
+def call_mcp(tool_name, arguments):
+    try:
+        payload = build_mcp_payload(tool_name, arguments)
+        response = _SESSION.post(
+            MCP_ENDPOINT,
+            headers=MCP_HEADERS,
+            data=payload,
+            timeout=30,
+            stream=True
+        )
+
+        # Check if it's SSE (by looking for `data:` lines)
+        if "text/event-stream" in response.headers.get("Content-Type", ""):
+            # data: fragments concatenate directly into one growing buffer
+            full_data = bytearray()
+            for line in response.iter_lines(decode_unicode=False):
+                if line[:5] == b"data:":
+                    full_data += line[5:].lstrip()
+
+            try:
+                return orjson.loads(full_data)
+            except Exception as e:
+                return {"error": f"Failed to parse streamed JSON: {e}", "raw": full_data.decode("utf-8", "replace")}
+
+        else:
+            # Standard JSON response, parsed straight from the undecoded body
+            body = response.content
+            try:
+                return orjson.loads(body)
+            except Exception as e:
+                return {"error": f"Failed to parse JSON: {e}", "raw": body.decode("utf-8", "replace")}
+
+    except Exception as e:
+        return {"error": str(e)}
+
+
+
+
+def create_mcp_client(limit: int) -> RetryClient:
+    """Pooled aiohttp client for call_mcp_async that retries transient failures."""
+    return RetryClient(
+        retry_options=MCP_RETRY_OPTIONS,
+        connector=aiohttp.TCPConnector(limit=limit)
+    )
+
+async def call_mcp_async(session: RetryClient, tool_name, arguments):
+    """
+    Async counterpart of call_mcp. Reuses the caller's client (see
+    create_mcp_client) so that TCP/TLS connections are pooled across tools.
+    """
+    try:
+        payload = build_mcp_payload(tool_name, arguments)
+        async with session.post(
+            MCP_ENDPOINT,
+            headers=MCP_HEADERS,
+            data=payload,
+            timeout=MCP_TIMEOUT
+        ) as response:
+
+            # Check if it's SSE (by looking for `data:` lines)
+            if "text/event-stream" in response.headers.get("Content-Type", ""):
+                # Read the body whole: iterating response.content caps line
+                # length, and a result can arrive as one multi-MB data: line
+                body = await response.read()
+                full_data = bytearray()
+                for line in body.splitlines():
+                    if line[:5] == b"data:":
+                        full_data += line[5:].lstrip()
+
+                try:
+                    return orjson.loads(full_data)
+                except Exception as e:
+                    return {"error": f"Failed to parse streamed JSON: {e}", "raw": full_data.decode("utf-8", "replace")}
+
+            else:
+                # Standard JSON response, parsed straight from the undecoded body
+                body = await response.read()
+                try:
+                    return orjson.loads(body)
+                except Exception as e:
+                    return {"error": f"Failed to parse JSON: {e}", "raw": body.decode("utf-8", "replace")}
+
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def classify_response_status(parsed: dict) -> str:
+    """Classify an already-parsed MCP response, as returned by call_mcp."""
+    try:
+        result = parsed.get("result") or {}
+        is_error = result.get("isError")
+
+        # Common case first: no need to look at content at all
+        if is_error is False:
+            return "success"
+        if is_error is not True:
+            return "unknown"
+
+        # ✅ Override: treat as success if specific string appears in content
+        content = result.get("content")
+        if isinstance(content, list) and any(
+            isinstance(item, dict) and "text" in item and
+            _OVERRIDE_TEXT in item["text"]
+            for item in content
+        ):
+            return "success"
+        return "error"
+
+    except Exception:
+        return "unknown"
+
+def classify_response_status_raw(raw_response: Union[str, bytes, dict]) -> str:
+    """Like classify_response_status, but also accepts a JSON string."""
+    if isinstance(raw_response, (str, bytes)):
+        try:
+            raw_response = orjson.loads(raw_response)
+        except Exception:
+            return "unknown"
+    return classify_response_status(raw_response)
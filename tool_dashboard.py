@@ -1,6 +1,7 @@
 import os
 import subprocess
 import sys
+import time
 
 # Try to import openpyxl; install it if missing
 try:
@@ -8,6 +9,7 @@ try:
 except ImportError:
     subprocess.check_call([sys.executable, "-m", "pip", "install", "openpyxl"])
 
+import orjson
 import streamlit as st
 from generate_and_test_mcp_calls import run_all_tool_tests_streaming
 
@@ -31,54 +33,92 @@ with top_col2:
 # --- Results Container ---
 output_container = st.container()
 
+RENDER_INTERVAL = 0.25  # max seconds a finished result waits before it is shown
+
+search_q = search_query.lower() if search_query else None
+
+def matches_search(result):
+    if not search_q:
+        return True
+    return search_q in result.get("_name_lc", "") or search_q in result.get("_type_lc", "")
+
+def to_json_text(value):
+    if isinstance(value, str):
+        return value
+    try:
+        return orjson.dumps(value, option=orjson.OPT_INDENT_2).decode()
+    except TypeError:
+        return str(value)
+
+def json_block(text):
+    fence = "```"
+    while fence in text:  # keep backticks inside the payload from closing the block
+        fence += "`"
+    return f"{fence}json\n{text}\n{fence}"
+
+# One markdown blob per tool instead of separate st.json/st.code widgets.
+# It is built once and kept on the result itself (in session_state), so reruns
+# such as editing the search box skip serialization, and the memo is freed
+# with the session rather than growing a process-wide cache.
+def render_tool_block(result):
+    block = result.get("_markdown")
+    if block is None:
+        block = "\n\n".join([
+            f"**📝 Description:** {result.get('description', '')}",
+            "**📥 Parameters:**",
+            json_block(to_json_text(result.get("parameters", {}))),
+            "**📤 Sample Input Sent:**",
+            json_block(to_json_text(result.get("input", {}))),
+            "**📄 Raw MCP Output:**",
+            json_block(to_json_text(result.get("output", "")))
+        ])
+        result["_markdown"] = block
+    return block
+
+def render_result(result):
+    status = result.get("status", "unknown")
+    icon = status_icons.get(status, "❔")
+
+    with output_container.expander(
+        f"{icon} `{result['name']}` ({result.get('type', 'N/A')}) - Status: {status.upper()}",
+        expanded=False
+    ):
+        st.markdown(render_tool_block(result))
+
+def render_batch(batch):
+    for result in batch:
+        if matches_search(result):
+            render_result(result)
+
 if run_tests:
     st.session_state.results = []
     output_container.empty()
 
     with st.spinner("Running MCP tool tests..."):
-        for result in run_all_tool_tests_streaming():
-            st.session_state.results.append(result)
-
-            if search_query:
-                if search_query.lower() not in result["name"].lower() and search_query.lower() not in result.get("type", "").lower():
-                    continue
-
-            status = result.get("status", "unknown")
-            icon = status_icons.get(status, "❔")
-
-            with output_container.expander(
-                f"{icon} `{result['name']}` ({result.get('type', 'N/A')}) - Status: {status.upper()}",
-                expanded=False
-            ):
-                st.markdown(f"**📝 Description:** {result.get('description', '')}")
-                st.markdown("**📥 Parameters:**")
-                st.json(result.get("parameters", {}))
-                st.markdown("**📤 Sample Input Sent:**")
-                st.json(result.get("input", {}))
-                st.markdown("**📄 Raw MCP Output:**")
-                st.code(result.get("output", ""), language="json")
+        # Render finished results in groups at most every RENDER_INTERVAL. The
+        # generator yields None while idle, so a waiting group is still shown
+        # on time even when the next tool is slow to finish.
+        pending = []
+        last_render = time.monotonic()
+        # Only dispatch tools that match the search, rather than filtering afterwards
+        for result in run_all_tool_tests_streaming(
+            name_filter=search_query or None,
+            type_filter=search_query or None,
+            idle_interval=RENDER_INTERVAL
+        ):
+            if result is not None:
+                st.session_state.results.append(result)
+                pending.append(result)
+
+            if pending and time.monotonic() - last_render >= RENDER_INTERVAL:
+                render_batch(pending)
+                pending = []
+                last_render = time.monotonic()
+
+        render_batch(pending)
 
     st.success(f"✅ Finished testing {len(st.session_state.results)} tools.")
 
 elif "results" in st.session_state:
     output_container.empty()
-    for result in st.session_state.results:
-        if search_query:
-            if search_query.lower() not in result["name"].lower() and search_query.lower() not in result.get("type", "").lower():
-                continue
-
-        status = result.get("status", "unknown")
-        icon = status_icons.get(status, "❔")
-
-        with output_container.expander(
-            f"{icon} `{result['name']}` ({result.get('type', 'N/A')}) - Status: {status.upper()}",
-            expanded=False
-        ):
-            st.markdown(f"**📝 Description:** {result.get('description', '')}")
-            st.markdown("**📥 Parameters:**")
-            st.json(result.get("parameters", {}))
-            st.markdown("**📤 Sample Input Sent:**")
-            st.json(result.get("input", {}))
-            st.markdown("**📄 Raw MCP Output:**")
-            st.code(result.get("output", ""), language="json")
-
+    render_batch(st.session_state.results)